@@ -1,25 +1,75 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 import asyncio
 import pyaudio
 import websockets
-import json
+import logging
 import os
+import socket
+import struct
 import dotenv
-import threading
+import msgspec
+import orjson
 from enum import Enum
 import uuid
 
 dotenv.load_dotenv()
 
-app = FastAPI(title="TTS Control API")
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await tts_service.close()
+
+
+app = FastAPI(title="TTS Control API", lifespan=lifespan)
 
 # Configuration
 DASHSCOPE_API_KEY = os.getenv('DASHSCOPE_API_KEY')
 WEBSOCKET_URL = "wss://dashscope.aliyuncs.com/api-ws/v1/inference"
 model = "cosyvoice-v3"
 voice = "cosyvoice-v3-prefix-36d6a3f4cbae4cd8bd3664acba2cc891"
+# Output format is fixed: DashScope is always asked for 16-bit mono PCM at this rate
+SAMPLE_RATE = 22050
+SAMPLE_FORMAT = pyaudio.paInt16
+CHANNELS = 1
+FRAMES_PER_BUFFER = 1024
+FRAME_BYTES = FRAMES_PER_BUFFER * CHANNELS * 2
+# Received audio frames buffered ahead of playback before recv() backs off
+AUDIO_QUEUE_MAX = 64
+# Short segments are merged until they reach this length or end a sentence
+SEGMENT_BATCH_CHARS = 20
+SENTENCE_ENDINGS = ("。", "！", "？", ".", "!", "?")
+# send() waits for the socket to drain below this many buffered bytes, so a slow
+# upstream pauses segment sending instead of queueing text in memory
+WEBSOCKET_WRITE_LIMIT = 4096
+# How long DashScope gets to acknowledge run-task with task-started
+TASK_START_TIMEOUT = 10.0
+# A reused connection that stays silent this long is treated as dead and replaced
+REUSED_TASK_START_TIMEOUT = 2.0
+# Slack on top of the queued audio's duration when waiting for playback to finish
+DRAIN_GRACE_SECONDS = 2.0
+# Completed syntheses kept for replay, keyed by (text_segments, model, voice).
+# Bounded by total PCM size (~44 KB per second of audio); meant for short
+# repeated phrases, so a result over the per-entry limit is not cached at all
+SYNTHESIS_CACHE_MAX_BYTES = 4 * 1024 * 1024
+SYNTHESIS_CACHE_ENTRY_MAX_BYTES = 256 * 1024
+# RIFF header for /tts/stream; the length fields are maxed out because the
+# total size is unknown while streaming
+WAV_STREAM_HEADER = struct.pack(
+    "<4sI4s4sIHHIIHH4sI",
+    b"RIFF", 0xFFFFFFFF, b"WAVE",
+    b"fmt ", 16, 1, CHANNELS, SAMPLE_RATE, SAMPLE_RATE * CHANNELS * 2, CHANNELS * 2, 16,
+    b"data", 0xFFFFFFFF
+)
 
 
 class SynthesisState(Enum):
@@ -28,282 +78,592 @@ class SynthesisState(Enum):
     STOPPED = "stopped"
 
 
-class TTSRequest(BaseModel):
+class TTSRequest(msgspec.Struct):
     text_segments: List[str]
-    model: Optional[str] = model
-    voice: Optional[str] = voice
+    model: str = model
+    voice: str = voice
+
+
+_tts_request_decoder = msgspec.json.Decoder(TTSRequest)
+# The endpoints read the raw body, so describe it to OpenAPI by hand
+_, _tts_request_components = msgspec.json.schema_components(
+    (TTSRequest,), ref_template="#/components/schemas/{name}"
+)
+_TTS_REQUEST_OPENAPI = {
+    "requestBody": {
+        "content": {
+            "application/json": {"schema": _tts_request_components["TTSRequest"]}
+        },
+        "required": True
+    }
+}
+
+
+# Declared response models let FastAPI serialize straight to JSON bytes
+# via Pydantic, without a custom response class
+class ControlResponse(BaseModel):
+    status: str
+    message: str
+    state: str
+
+
+class StatusResponse(BaseModel):
+    state: str
+
+
+class HealthResponse(BaseModel):
+    status: str
+
+
+async def _read_tts_request(request: Request) -> TTSRequest:
+    """Decode and validate the request body in one pass"""
+    try:
+        tts_request = _tts_request_decoder.decode(await request.body())
+    except msgspec.DecodeError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    # Whitespace-only segments would cost a continue-task round trip for no audio
+    tts_request.text_segments = [text for text in tts_request.text_segments if text.strip()]
+    if not tts_request.text_segments:
+        raise HTTPException(status_code=400, detail="No text to synthesize")
+    return tts_request
+
+
+def _batch_segments(text_segments: List[str]) -> List[str]:
+    """Merge short segments so each continue-task carries a useful amount of text"""
+    batches = []
+    pending = []
+    pending_len = 0
+    for text in text_segments:
+        pending.append(text)
+        pending_len += len(text)
+        if pending_len >= SEGMENT_BATCH_CHARS or text.rstrip().endswith(SENTENCE_ENDINGS):
+            batches.append("".join(pending))
+            pending.clear()
+            pending_len = 0
+    if pending:
+        batches.append("".join(pending))
+    return batches
+
+
+class SynthesisError(Exception):
+    """DashScope reported task-failed for a running task"""
+
+
+async def _open_connection():
+    """Open a DashScope WebSocket connection"""
+    headers = {
+        "Authorization": f"bearer {DASHSCOPE_API_KEY}",
+    }
+    # websockets keeps the connection alive between sessions with its own pings
+    websocket = await websockets.connect(
+        WEBSOCKET_URL,
+        additional_headers=headers,
+        write_limit=WEBSOCKET_WRITE_LIMIT
+    )
+    
+    # Control frames are tiny; make sure Nagle never holds them back
+    sock = websocket.transport.get_extra_info("socket")
+    if sock is not None:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    
+    logger.info("WebSocket 连接已建立")
+    return websocket
+
+
+def _run_task_message(task_id: str, model: str, voice: str) -> bytes:
+    """Encode the run-task command"""
+    return orjson.dumps({
+        "header": {
+            "action": "run-task",
+            "task_id": task_id,
+            "streaming": "duplex"
+        },
+        "payload": {
+            "task_group": "audio",
+            "task": "tts",
+            "function": "SpeechSynthesizer",
+            "model": model,
+            "parameters": {
+                "text_type": "PlainText",
+                "voice": voice,
+                "format": "pcm",
+                "sample_rate": SAMPLE_RATE,
+                "volume": 50,
+                "rate": 1.0,
+                "pitch": 1.0
+            },
+            "input": {}
+        }
+    })
+
+
+async def _run_task(
+    websocket, run_task: bytes, timeout: float = TASK_START_TIMEOUT
+) -> Optional[bool]:
+    """Send run-task and wait for task-started
+    
+    Returns False if the task was rejected and None if DashScope did not answer in time.
+    """
+    await websocket.send(run_task, text=True)
+    logger.info("已发送 run-task 指令")
+    
+    try:
+        return await asyncio.wait_for(_wait_task_started(websocket), timeout)
+    except asyncio.TimeoutError:
+        logger.error("等待 task-started 事件超时")
+        return None
+
+
+async def _wait_task_started(websocket) -> bool:
+    """Read events until the task is started or rejected"""
+    while True:
+        response = await websocket.recv()
+        if isinstance(response, str):
+            event = orjson.loads(response)
+            event_type = event.get("header", {}).get("event")
+            if event_type == "task-started":
+                logger.info("收到 task-started 事件")
+                return True
+            elif event_type == "task-failed":
+                error_msg = event.get("header", {}).get("error_message", "Unknown error")
+                logger.error("任务启动失败: %s", error_msg)
+                return False
+
+
+async def _send_text(websocket, task_id: str, text_segments: List[str]):
+    """Send the text of a started task followed by finish-task"""
+    # Only the text changes between continue-task messages, so
+    # encode the surrounding JSON once per task; frames are sent as
+    # pre-encoded UTF-8 with the text opcode
+    continue_prefix = (
+        '{"header":{"action":"continue-task","task_id":"%s",'
+        '"streaming":"duplex"},"payload":{"input":{"text":' % task_id
+    ).encode()
+    continue_suffix = b'}}}'
+    
+    # Send text segments, batched into fewer frames
+    batches = _batch_segments(text_segments)
+    for i, text in enumerate(batches):
+        await websocket.send(
+            continue_prefix + orjson.dumps(text) + continue_suffix, text=True
+        )
+        logger.debug("已发送文本段 %d/%d: %s", i + 1, len(batches), text)
+    
+    finish_task = (
+        '{"header":{"action":"finish-task","task_id":"%s",'
+        '"streaming":"duplex"},"payload":{"input":{}}}' % task_id
+    ).encode()
+    await websocket.send(finish_task, text=True)
+    logger.info("已发送 finish-task 指令")
+
+
+async def _synthesize(websocket, task_id: str, text_segments: List[str]):
+    """Send the text of a started task and yield its PCM frames until task-finished"""
+    # Text goes out while audio for the first segments is already arriving
+    sender = asyncio.create_task(_send_text(websocket, task_id, text_segments))
+    try:
+        while True:
+            response = await websocket.recv()
+            
+            if isinstance(response, bytes):
+                # Binary audio data
+                logger.debug("收到音频数据: %d 字节", len(response))
+                yield response
+            elif isinstance(response, str):
+                # result-generated is by far the most frequent event
+                # and carries nothing we act on, so skip parsing it
+                if '"result-generated"' in response:
+                    logger.debug("收到 result-generated 事件")
+                    continue
+                
+                # JSON event
+                event = orjson.loads(response)
+                event_type = event.get("header", {}).get("event")
+                
+                if event_type == "task-finished":
+                    logger.info("收到 task-finished 事件，合成完成")
+                    return
+                elif event_type == "task-failed":
+                    raise SynthesisError(
+                        event.get("header", {}).get("error_message", "Unknown error")
+                    )
+    finally:
+        if not sender.done():
+            sender.cancel()
+        elif not sender.cancelled() and sender.exception():
+            logger.error("发送文本时出错: %s", sender.exception())
+
+
+async def _stream_wav(websocket, task_id: str, text_segments: List[str]):
+    """Yield a WAV stream for a started task, closing its connection when done"""
+    audio = _synthesize(websocket, task_id, text_segments)
+    try:
+        yield WAV_STREAM_HEADER
+        async for pcm in audio:
+            yield pcm
+    finally:
+        await audio.aclose()
+        await websocket.close()
 
 
 class TTSService:
     def __init__(self):
         self.state = SynthesisState.IDLE
-        self.synthesis_thread: Optional[threading.Thread] = None
-        self._lock = threading.Lock()
-        self._stop_event = threading.Event()
+        self._task: Optional[asyncio.Task] = None
+        # start() and stop() await inside, so serialize them to keep state and _task consistent
+        self._lock = asyncio.Lock()
         self.websocket = None
         self.player = None
         self.stream = None
+        # Filled by the receive loop, drained by the PortAudio callback thread
+        self._audio_q: deque = deque()
+        self._audio_finished = False
+        # Set from the callback thread once the final buffer has been handed over
+        self._audio_drained: Optional[asyncio.Event] = None
+        # Set from the callback thread once a full queue has room again
+        self._audio_space: Optional[asyncio.Event] = None
+        self._audio_space_wanted = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # LRU of finished sessions' PCM, stored as the chunks that were queued
+        self._cache: OrderedDict = OrderedDict()
+        self._cache_bytes = 0
+        # Every PortAudio call goes through this one thread, so a stop issued
+        # while a start is still in flight is queued behind it, not raced against it
+        self._audio_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="portaudio")
+
+    def _audio_callback(self, in_data, frame_count, time_info, status):
+        """PortAudio pull callback; runs on PortAudio's own thread"""
+        needed = frame_count * 2
+        audio_q = self._audio_q
+        # The receive loop queues FRAME_BYTES-sized chunks, so this is the steady state
+        if audio_q and len(audio_q[0]) == needed:
+            chunk = audio_q.popleft()
+            if self._audio_space_wanted:
+                self._notify_space()
+            return chunk, pyaudio.paContinue
+
+        out = bytearray()
+        while audio_q and len(out) < needed:
+            chunk = audio_q.popleft()
+            take = needed - len(out)
+            if len(chunk) > take:
+                audio_q.appendleft(chunk[take:])
+                chunk = chunk[:take]
+            out += chunk
+        if self._audio_space_wanted:
+            self._notify_space()
+
+        if len(out) < needed:
+            if self._audio_finished and not audio_q:
+                self._loop.call_soon_threadsafe(self._audio_drained.set)
+                # PyAudio pads a short final buffer with silence
+                return bytes(out), pyaudio.paComplete
+            # Network underrun: play silence rather than stalling the stream
+            out += bytes(needed - len(out))
+        return bytes(out), pyaudio.paContinue
+
+    async def _run_audio(self, func, *args):
+        """Run a blocking PortAudio call on the audio thread"""
+        return await asyncio.get_running_loop().run_in_executor(self._audio_executor, func, *args)
+
+    def _notify_space(self):
+        """Wake a receive loop waiting in _queue_chunk; called from the callback thread"""
+        if len(self._audio_q) < AUDIO_QUEUE_MAX:
+            self._audio_space_wanted = False
+            self._loop.call_soon_threadsafe(self._audio_space.set)
+
+    def _open_stream(self):
+        """Return the output stream, opening it on first use"""
+        if self.stream is None:
+            self.player = pyaudio.PyAudio()
+            self.stream = self.player.open(
+                format=SAMPLE_FORMAT,
+                channels=CHANNELS,
+                rate=SAMPLE_RATE,
+                output=True,
+                frames_per_buffer=FRAMES_PER_BUFFER,
+                stream_callback=self._audio_callback,
+                start=False
+            )
+        return self.stream
+
+    def _pause_stream(self):
+        """Stop playback but keep the stream open for the next session"""
+        if self.stream and not self.stream.is_stopped():
+            try:
+                self.stream.stop_stream()
+            except Exception as e:
+                logger.error("停止音频流时出错: %s", e)
+
+    def _close_stream(self):
+        """Release the output stream and PortAudio"""
+        if self.stream:
+            try:
+                self.stream.close()
+            except Exception as e:
+                logger.error("关闭音频流时出错: %s", e)
+            self.stream = None
+        
+        if self.player:
+            try:
+                self.player.terminate()
+            except Exception as e:
+                logger.error("终止播放器时出错: %s", e)
+            self.player = None
+
+    async def _queue_chunk(self, chunk: bytes, pcm_chunks: List[bytes]):
+        """Queue one buffer for playback, backing off while playback is far enough behind"""
+        while len(self._audio_q) >= AUDIO_QUEUE_MAX:
+            # If the callback pops before seeing the flag, the next callback still wakes us
+            self._audio_space.clear()
+            self._audio_space_wanted = True
+            await self._audio_space.wait()
+        self._audio_q.append(chunk)
+        pcm_chunks.append(chunk)
+
+    async def _wait_drained(self):
+        """Mark the queue complete and wait for the callback to play it out"""
+        self._audio_finished = True
+        # Bounded by the queued audio's duration in case the device stops calling back
+        timeout = len(self._audio_q) * FRAMES_PER_BUFFER / SAMPLE_RATE + DRAIN_GRACE_SECONDS
+        try:
+            await asyncio.wait_for(self._audio_drained.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("等待音频播放完成超时")
+
+    def _cache_result(self, cache_key: tuple, pcm_chunks: List[bytes]):
+        """Keep a finished session's PCM, evicting the oldest entries over the size limit"""
+        size = sum(map(len, pcm_chunks))
+        if size > SYNTHESIS_CACHE_ENTRY_MAX_BYTES or cache_key in self._cache:
+            return
+        self._cache[cache_key] = tuple(pcm_chunks)
+        self._cache_bytes += size
+        while self._cache_bytes > SYNTHESIS_CACHE_MAX_BYTES:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_bytes -= sum(map(len, evicted))
+
+    async def _connect(self):
+        """Open a fresh shared DashScope connection, replacing any previous one"""
+        await self._close_connection(self.websocket)
+        self.websocket = await _open_connection()
+        return self.websocket
+
+    def _detach_connection(self, websocket):
+        """Stop sharing a connection, unless another session has already replaced it"""
+        if self.websocket is websocket:
+            self.websocket = None
+
+    async def _close_connection(self, websocket):
+        """Close a DashScope connection and stop sharing it"""
+        if websocket:
+            self._detach_connection(websocket)
+            try:
+                await websocket.close()
+            except:
+                pass
 
     async def _synthesis_worker(self, text_segments: List[str], model: str, voice: str):
-        """Worker function to run synthesis with direct WebSocket control"""
+        """Worker coroutine to run synthesis with direct WebSocket control"""
+        audio = None
+        websocket = None
+        keep_connection = False
         try:
-            # Connect to WebSocket
-            headers = {
-                "Authorization": f"bearer {DASHSCOPE_API_KEY}",
-            }
+            # Restart the long-lived audio stream for this session
+            self._audio_q.clear()
+            self._audio_finished = False
+            self._audio_drained = asyncio.Event()
+            self._audio_space = asyncio.Event()
+            self._audio_space_wanted = False
+            self._loop = asyncio.get_running_loop()
+            # PortAudio calls block on the host audio API, so keep them off the event loop
+            stream = await self._run_audio(self._open_stream)
+            await self._run_audio(stream.start_stream)
             
-            async with websockets.connect(WEBSOCKET_URL, additional_headers=headers) as websocket:
-                self.websocket = websocket
-                
-                # Initialize audio player
-                self.player = pyaudio.PyAudio()
-                self.stream = self.player.open(
-                    format=pyaudio.paInt16,
-                    channels=1,
-                    rate=22050,
-                    output=True
-                )
-                
-                print(f"WebSocket 连接已建立")
-                
-                # Generate task ID
-                task_id = str(uuid.uuid4())
-                
-                # Send run-task command
-                run_task = {
-                    "header": {
-                        "action": "run-task",
-                        "task_id": task_id,
-                        "streaming": "duplex"
-                    },
-                    "payload": {
-                        "task_group": "audio",
-                        "task": "tts",
-                        "function": "SpeechSynthesizer",
-                        "model": model,
-                        "parameters": {
-                            "text_type": "PlainText",
-                            "voice": voice,
-                            "format": "pcm",
-                            "sample_rate": 22050,
-                            "volume": 50,
-                            "rate": 1.0,
-                            "pitch": 1.0
-                        },
-                        "input": {}
-                    }
-                }
-                
-                await websocket.send(json.dumps(run_task))
-                print("已发送 run-task 指令")
-                
-                # Wait for task-started event
-                task_started = False
-                while not task_started and not self._stop_event.is_set():
-                    try:
-                        response = await asyncio.wait_for(websocket.recv(), timeout=0.1)
-                        if isinstance(response, str):
-                            event = json.loads(response)
-                            if event.get("header", {}).get("event") == "task-started":
-                                task_started = True
-                                print("收到 task-started 事件")
-                    except asyncio.TimeoutError:
-                        continue
-                
-                if self._stop_event.is_set():
-                    print("在任务启动前收到停止信号")
-                    await websocket.close()
-                    return
-                
-                # Create task to receive audio data
-                async def receive_audio():
-                    try:
-                        while not self._stop_event.is_set():
-                            try:
-                                response = await asyncio.wait_for(websocket.recv(), timeout=0.1)
-                                
-                                if isinstance(response, bytes):
-                                    # Binary audio data
-                                    if not self._stop_event.is_set() and self.stream:
-                                        self.stream.write(response)
-                                        print(f"播放音频数据: {len(response)} 字节")
-                                elif isinstance(response, str):
-                                    # JSON event
-                                    event = json.loads(response)
-                                    event_type = event.get("header", {}).get("event")
-                                    
-                                    if event_type == "task-finished":
-                                        print("收到 task-finished 事件，合成完成")
-                                        break
-                                    elif event_type == "task-failed":
-                                        error_msg = event.get("header", {}).get("error_message", "Unknown error")
-                                        print(f"任务失败: {error_msg}")
-                                        break
-                                    elif event_type == "result-generated":
-                                        print("收到 result-generated 事件")
-                                        
-                            except asyncio.TimeoutError:
-                                continue
-                                
-                    except Exception as e:
-                        print(f"接收音频时出错: {e}")
-                
-                # Start receiving audio in background
-                receive_task = asyncio.create_task(receive_audio())
-                
-                # Send text segments
-                for i, text in enumerate(text_segments):
-                    if self._stop_event.is_set():
-                        print(f"在发送第 {i+1}/{len(text_segments)} 段时收到停止信号")
-                        break
-                    
-                    continue_task = {
-                        "header": {
-                            "action": "continue-task",
-                            "task_id": task_id,
-                            "streaming": "duplex"
-                        },
-                        "payload": {
-                            "input": {
-                                "text": text
-                            }
-                        }
-                    }
-                    
-                    await websocket.send(json.dumps(continue_task))
-                    print(f"已发送文本段 {i+1}/{len(text_segments)}: {text}")
-                    
-                    # Small delay between segments, with stop check
-                    for _ in range(10):
-                        if self._stop_event.is_set():
-                            break
-                        await asyncio.sleep(0.01)
-                    
-                    if self._stop_event.is_set():
-                        break
+            # Replay a previous identical request without touching the network
+            cache_key = (tuple(text_segments), model, voice)
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                self._cache.move_to_end(cache_key)
+                logger.info("命中合成缓存，直接播放")
+                # The shared connection is not used by this session
+                keep_connection = True
+                self._audio_q.extend(cached)
+                await self._wait_drained()
+                return
+            
+            task_id = str(uuid.uuid4())
+            run_task = _run_task_message(task_id, model, voice)
+            
+            # Reuse the connection left open by the previous session if there is
+            # one; if it is closed or does not answer, retry once on a fresh one
+            websocket = self.websocket
+            started = None
+            if websocket is not None and websocket.close_code is None:
+                try:
+                    started = await _run_task(websocket, run_task, REUSED_TASK_START_TIMEOUT)
+                except websockets.ConnectionClosed:
+                    pass
+                if started is None:
+                    logger.info("复用的 WebSocket 连接不可用，重新连接")
+            if started is None:
+                websocket = await self._connect()
+                started = await _run_task(websocket, run_task)
+            if not started:
+                return
+            
+            # Everything queued for playback, kept for the synthesis cache
+            pcm_chunks = []
+            
+            # Re-chunk network frames to the PortAudio buffer size; only the
+            # remainder that straddles two frames goes through pcm_accum
+            pcm_accum = bytearray()
+            audio = _synthesize(websocket, task_id, text_segments)
+            async for pcm in audio:
+                view = memoryview(pcm)
+                if pcm_accum:
+                    # Top up the partial buffer left over from the previous frame
+                    take = FRAME_BYTES - len(pcm_accum)
+                    pcm_accum += view[:take]
+                    view = view[take:]
+                    if len(pcm_accum) == FRAME_BYTES:
+                        await self._queue_chunk(bytes(pcm_accum), pcm_chunks)
+                        pcm_accum.clear()
+                # Slice whole buffers straight out of the received frame
+                while len(view) >= FRAME_BYTES:
+                    await self._queue_chunk(bytes(view[:FRAME_BYTES]), pcm_chunks)
+                    view = view[FRAME_BYTES:]
+                pcm_accum += view
+            
+            # Queue the final partial buffer
+            if pcm_accum:
+                await self._queue_chunk(bytes(pcm_accum), pcm_chunks)
+            
+            self._cache_result(cache_key, pcm_chunks)
+            
+            # Let PortAudio play out whatever is still queued; stop_stream() in
+            # the cleanup below then waits for the last buffer to finish
+            await self._wait_drained()
+            
+            # The task ran to task-finished, so the connection is clean to reuse
+            keep_connection = True
                 
-                # Send finish-task if not stopped
-                if not self._stop_event.is_set():
-                    finish_task = {
-                        "header": {
-                            "action": "finish-task",
-                            "task_id": task_id,
-                            "streaming": "duplex"
-                        },
-                        "payload": {
-                            "input": {}
-                        }
-                    }
-                    await websocket.send(json.dumps(finish_task))
-                    print("已发送 finish-task 指令")
-                    
-                    # Wait for receive task to complete
-                    await receive_task
-                else:
-                    print("跳过 finish-task，因为已停止")
-                    receive_task.cancel()
-                    
+        except asyncio.CancelledError:
+            logger.info("合成任务已被停止信号取消")
+            raise
+        except SynthesisError as e:
+            logger.error("任务失败: %s", e)
         except Exception as e:
-            print(f"合成错误: {e}")
+            logger.error("合成错误: %s", e)
         finally:
+            # Detach before awaiting anything, so a session started meanwhile
+            # cannot pick up this connection and its in-flight audio
+            if not keep_connection:
+                self._detach_connection(websocket)
+            
             # Clean up
-            if self.stream:
-                try:
-                    self.stream.stop_stream()
-                    self.stream.close()
-                except:
-                    pass
-                self.stream = None
-                
-            if self.player:
-                try:
-                    self.player.terminate()
-                except:
-                    pass
-                self.player = None
+            if audio is not None:
+                await audio.aclose()
             
-            if self.websocket:
-                try:
-                    await self.websocket.close()
-                except:
-                    pass
-                self.websocket = None
+            await self._run_audio(self._pause_stream)
+            
+            if not keep_connection:
+                await self._close_connection(websocket)
                 
-            with self._lock:
+            # A stop that timed out may have let a new session start meanwhile
+            if self._task is asyncio.current_task():
+                self._task = None
                 self.state = SynthesisState.IDLE
-                print("合成工作线程已结束，资源已清理")
+            logger.info("合成任务已结束，资源已清理")
 
-    def _run_async_synthesis(self, text_segments: List[str], model: str, voice: str):
-        """Run async synthesis worker in a thread"""
-        asyncio.run(self._synthesis_worker(text_segments, model, voice))
-
-    def start(self, text_segments: List[str], model: str, voice: str):
+    async def start(self, text_segments: List[str], model: str, voice: str):
         """Start TTS synthesis"""
-        with self._lock:
-            if self.state == SynthesisState.RUNNING:
+        async with self._lock:
+            if self.state in (SynthesisState.RUNNING, SynthesisState.STOPPED):
                 raise HTTPException(status_code=400, detail="Synthesis already running")
 
             self.state = SynthesisState.RUNNING
-            self._stop_event.clear()
 
-        # Start synthesis in a separate thread
-        self.synthesis_thread = threading.Thread(
-            target=self._run_async_synthesis,
-            args=(text_segments, model, voice),
-            daemon=True
-        )
-        self.synthesis_thread.start()
+            # Run synthesis as a task on the server's own event loop
+            self._task = asyncio.create_task(
+                self._synthesis_worker(text_segments, model, voice)
+            )
 
-    def stop(self):
+    async def stop(self):
         """Stop TTS synthesis immediately"""
-        with self._lock:
+        async with self._lock:
             if self.state != SynthesisState.RUNNING:
                 raise HTTPException(status_code=400, detail="No synthesis running")
 
-            print("发送停止信号...")
+            logger.info("发送停止信号...")
             self.state = SynthesisState.STOPPED
-            self._stop_event.set()
-            
-            # Immediately stop audio playback
-            if self.stream:
-                try:
-                    print("停止音频流...")
-                    self.stream.stop_stream()
-                    self.stream.close()
-                    self.stream = None
-                except Exception as e:
-                    print(f"停止音频流时出错: {e}")
+            # Playback falls silent from the next buffer on
+            self._audio_q.clear()
+            # The stopped task's audio may still be arriving, so no later session
+            # may reuse its connection, even if the worker is slow to unwind
+            websocket = self.websocket
+            self.websocket = None
+
+            task = self._task
+            if task:
+                task.cancel()
+                # The worker stops the audio stream and closes the WebSocket as it unwinds
+                await asyncio.wait({task}, timeout=1.0)
+
+            await self._close_connection(websocket)
+            logger.info("停止命令已执行，音频播放已停止")
             
-            if self.player:
-                try:
-                    self.player.terminate()
-                    self.player = None
-                except Exception as e:
-                    print(f"终止播放器时出错: {e}")
+            # The worker resets state itself if it finished unwinding in time
+            if self._task is task:
+                self._task = None
+                self.state = SynthesisState.IDLE
+            logger.info("TTS 服务状态已重置为 IDLE")
 
-        print("停止命令已执行，音频播放已停止")
-        
-        with self._lock:
-            self.state = SynthesisState.IDLE
-            print("TTS 服务状态已重置为 IDLE")
+    async def close(self):
+        """Cancel any running synthesis and release the connection and audio device"""
+        task = self._task
+        if task:
+            task.cancel()
+            await asyncio.wait({task}, timeout=1.0)
+        await self._close_connection(self.websocket)
+        await self._run_audio(self._close_stream)
+        self._audio_executor.shutdown()
+
+    async def open_audio_stream(self, text_segments: List[str], model: str, voice: str):
+        """Start a synthesis whose audio is returned to the caller as WAV instead of played
+
+        Runs on its own connection and does not touch local playback, so it is
+        independent of the start/stop session.
+        """
+        task_id = str(uuid.uuid4())
+        websocket = await _open_connection()
+        try:
+            started = await _run_task(websocket, _run_task_message(task_id, model, voice))
+        except BaseException:
+            await websocket.close()
+            raise
+        if not started:
+            await websocket.close()
+            raise HTTPException(status_code=502, detail="Synthesis task was rejected")
+        return _stream_wav(websocket, task_id, text_segments)
 
     def get_state(self) -> str:
-        with self._lock:
-            return self.state.value
+        return self.state.value
 
 
 # Global TTS service instance
 tts_service = TTSService()
 
 
-@app.post("/tts/start")
-async def start_synthesis(request: TTSRequest):
+@app.post("/tts/start", response_model=ControlResponse, openapi_extra=_TTS_REQUEST_OPENAPI)
+async def start_synthesis(request: Request):
     """Start TTS synthesis with the provided text segments"""
+    tts_request = await _read_tts_request(request)
     try:
-        tts_service.start(
-            text_segments=request.text_segments,
-            model=request.model,
-            voice=request.voice
+        await tts_service.start(
+            text_segments=tts_request.text_segments,
+            model=tts_request.model,
+            voice=tts_request.voice
         )
         return {
             "status": "success",
@@ -316,11 +676,11 @@ async def start_synthesis(request: TTSRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/tts/stop")
+@app.post("/tts/stop", response_model=ControlResponse)
 async def stop_synthesis():
     """Stop the currently running TTS synthesis"""
     try:
-        tts_service.stop()
+        await tts_service.stop()
         return {
             "status": "success",
             "message": "TTS synthesis stopped",
@@ -332,7 +692,24 @@ async def stop_synthesis():
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/tts/status")
+@app.post("/tts/stream", openapi_extra=_TTS_REQUEST_OPENAPI)
+async def stream_synthesis(request: Request):
+    """Synthesize the text segments and stream the audio back as WAV"""
+    tts_request = await _read_tts_request(request)
+    try:
+        audio = await tts_service.open_audio_stream(
+            text_segments=tts_request.text_segments,
+            model=tts_request.model,
+            voice=tts_request.voice
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(audio, media_type="audio/wav")
+
+
+@app.get("/tts/status", response_model=StatusResponse)
 async def get_status():
     """Get current TTS synthesis status"""
     return {
@@ -340,7 +717,7 @@ async def get_status():
     }
 
 
-@app.get("/health")
+@app.get("/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
@@ -348,4 +725,4 @@ async def health_check():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="127.0.0.1", port=8000)
+    uvicorn.run(app, host="127.0.0.1", port=8000, loop="uvloop", http="httptools")